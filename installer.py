@@ -4,20 +4,24 @@ Arch Linux Auto-Installer with Rich TUI
 Provides a clean interface for pacman/yay installations while preserving interactivity
 """
 
+import os
+import re
+import selectors
+import shutil
+import signal
 import subprocess
 import threading
 import time
-import queue
 import sys
-from datetime import datetime
-from typing import List, Optional
+from collections import deque
+from itertools import islice
+from typing import List, Optional, Tuple
 
 from rich.console import Console
 from rich.layout import Layout
 from rich.panel import Panel
 from rich.live import Live
 from rich.text import Text
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskID
 from rich.align import Align
 
 
@@ -28,12 +32,55 @@ class ArchInstaller:
         self.layout = Layout()
         self.current_package = ""
         self.installation_status = "Ready"
-        self.custom_logs = []
-        self.pacman_output = []
+        # Bounded, larger than the visible window
+        self.custom_logs = deque(maxlen=200)
+        self.pacman_output = deque(maxlen=64)
+        # Guards both deques against iteration while another thread appends
+        self.output_lock = threading.Lock()
         self.progress_total = 0
         self.progress_current = 0
-        self.output_queue = queue.Queue()
+
+        # add_log() reformats its timestamp only when the second changes
+        self.log_time = 0
+        self.log_timestamp = ""
+
+        # Every possible 20-cell progress bar, indexed by filled cells
+        self.progress_bars = ["█" * n + "░" * (20 - n) for n in range(21)]
         self.current_process: Optional[subprocess.Popen] = None
+        self.input_prompt = ""
+
+        # Resolved once; None when the tool is not installed
+        self.pacman_path = shutil.which("pacman")
+        self.yay_path = shutil.which("yay")
+
+        # Panels that need rebuilding on the next update_display()
+        self.dirty = {"status", "logs", "output", "input"}
+        self.dirty_lock = threading.Lock()
+
+        # Redraws happen on the refresh thread, only when state changed
+        self.live: Optional[Live] = None
+        self.refresh_event = threading.Event()
+        self.refresh_thread: Optional[threading.Thread] = None
+        self.previous_winch = signal.SIG_DFL
+        self.refresh_interval = 0.1  # Bursts of changes are merged into one redraw
+        self.running = False
+
+        # One selector for keyboard input and, while installing, the child's
+        # output and exit; stdin is set aside while a child owns the terminal
+        self.selector = selectors.DefaultSelector()
+        try:
+            self.selector.register(sys.stdin, selectors.EVENT_READ, "input")
+        except (ValueError, OSError):
+            pass  # Not pollable (e.g. redirected from a file), read directly
+
+        # pacman's per-package transaction lines, matched once per output line
+        self.installing_re = re.compile(
+            r"(?:\(\s*\d+/\d+\)\s+)?(?:installing|upgrading|reinstalling) "
+            r"(\S+?)(?:\.\.\.)?(?:\s|$)"
+        )
+
+        # Targets of the running batch transaction not yet seen installing
+        self.batch_pending = set()
 
         # Create layout structure
         self.setup_layout()
@@ -59,100 +106,249 @@ class ArchInstaller:
             Layout(name="status", size=8), Layout(name="logs")
         )
 
-    def update_display(self):
-        """Update all display areas"""
-        # Header
+        # Static areas never change, render them once
         header_text = Text(
             "🔧 Arch Linux Auto-Installer", style="bold blue", justify="center"
         )
         self.layout["header"].update(Panel(header_text, style="blue"))
+        self.layout["spacer1"].update(Panel("", style="dim", border_style="dim"))
+        self.layout["spacer2"].update(Panel("", style="dim", border_style="dim"))
+
+        # Panel chrome is created once, update_display() only swaps contents
+        self.status_panel = Panel("", title="Status", border_style="green")
+        self.logs_panel = Panel("", title="Installation Log", border_style="yellow")
+        self.output_panel = Panel("", title="Pacman/Yay Output", border_style="cyan")
+        self.input_panel = Panel("", style="bold white", border_style="bright_white")
+        self.layout["status"].update(self.status_panel)
+        self.layout["logs"].update(self.logs_panel)
+        self.layout["right_panel"].update(self.output_panel)
+        self.layout["input_area"].update(self.input_panel)
+
+    def update_display(self):
+        """Rebuild the display areas whose state changed since the last call"""
+        with self.dirty_lock:
+            dirty, self.dirty = self.dirty, set()
 
         # Status area
-        status_content = Text()
-        status_content.append("Installation Status\n", style="bold green")
-        status_content.append(f"Current: {self.current_package or 'None'}\n")
-        status_content.append(f"Status: {self.installation_status}\n")
-        if self.progress_total > 0:
-            progress_bar = "█" * int((self.progress_current / self.progress_total) * 20)
-            progress_empty = "░" * (20 - len(progress_bar))
-            progress_text = f"[{progress_bar}{progress_empty}] {self.progress_current}/{self.progress_total}"
-            status_content.append(f"Progress: {progress_text}\n")
-        self.layout["status"].update(
-            Panel(status_content, title="Status", border_style="green")
-        )
+        if "status" in dirty:
+            status_content = Text()
+            status_content.append("Installation Status\n", style="bold green")
+            status_content.append(f"Current: {self.current_package or 'None'}\n")
+            status_content.append(f"Status: {self.installation_status}\n")
+            if self.progress_total > 0:
+                filled = int(self.progress_current / self.progress_total * 20)
+                bar = self.progress_bars[filled]
+                status_content.append(
+                    f"Progress: [{bar}] {self.progress_current}/{self.progress_total}\n"
+                )
+            self.status_panel.renderable = status_content
 
         # Custom logs area
-        log_content = Text()
-        recent_logs = self.custom_logs[-12:]  # Reduced to fit better
-        for log in recent_logs:
-            log_content.append(f"{log}\n")
-        self.layout["logs"].update(
-            Panel(log_content, title="Installation Log", border_style="yellow")
-        )
+        if "logs" in dirty:
+            # Only the tail fits the panel; snapshot it while writers are held off
+            with self.output_lock:
+                start = max(len(self.custom_logs) - 12, 0)
+                recent_logs = list(islice(self.custom_logs, start, None))
+            self.logs_panel.renderable = Text("\n".join(recent_logs))
 
         # Pacman output area
-        pacman_content = Text()
-        recent_output = self.pacman_output[-20:]  # Reduced to fit better
-        for line in recent_output:
-            pacman_content.append(f"{line}\n")
-        self.layout["right_panel"].update(
-            Panel(pacman_content, title="Pacman/Yay Output", border_style="cyan")
-        )
-
-        # Spacers
-        self.layout["spacer1"].update(Panel("", style="dim", border_style="dim"))
-        self.layout["spacer2"].update(Panel("", style="dim", border_style="dim"))
+        if "output" in dirty:
+            with self.output_lock:
+                start = max(len(self.pacman_output) - 20, 0)
+                recent_output = list(islice(self.pacman_output, start, None))
+            self.output_panel.renderable = Text("\n".join(recent_output))
 
         # Input area - more prominent
-        input_text = Text(
-            ">>> Enter your choice or press Enter to continue <<<",
-            style="bold yellow on blue",
-        )
-        self.layout["input_area"].update(
-            Panel(
-                Align.center(input_text),
-                style="bold white",
-                border_style="bright_white",
-            )
-        )
+        if "input" in dirty:
+            prompt = self.input_prompt or "Enter your choice or press Enter to continue"
+            input_text = Text(f">>> {prompt} <<<", style="bold yellow on blue")
+            self.input_panel.renderable = Align.center(input_text)
+
+    def mark_dirty(self, *panels: str):
+        """Flag panels for rebuilding and wake the refresh thread"""
+        with self.dirty_lock:
+            self.dirty.update(panels)
+        self.refresh_event.set()
+
+    def start_refresh(self, live: Live):
+        """Start redrawing the given Live display on state changes"""
+        self.live = live
+        self.running = True
+        self.refresh_thread = threading.Thread(target=self.refresh_loop, daemon=True)
+        self.refresh_thread.start()
+        self.refresh_event.set()
+
+        # Nothing else changes on a terminal resize, so redraw explicitly
+        self.previous_winch = signal.signal(signal.SIGWINCH, self.handle_resize)
+
+    def stop_refresh(self):
+        """Stop the refresh thread"""
+        signal.signal(signal.SIGWINCH, self.previous_winch)
+        self.running = False
+        self.refresh_event.set()
+        self.refresh_thread.join()
+
+    def handle_resize(self, signum, frame):
+        """SIGWINCH handler: redraw everything at the new terminal size"""
+        # The handler interrupts the main thread, which may be holding the
+        # locks mark_dirty needs; taking them from another thread is safe
+        threading.Thread(
+            target=self.mark_dirty,
+            args=("status", "logs", "output", "input"),
+            daemon=True,
+        ).start()
+
+    def refresh_loop(self):
+        """Redraw the screen when state changes, at most once per refresh_interval"""
+        while True:
+            self.refresh_event.wait()
+            self.refresh_event.clear()
+            if not self.running:
+                break
+            try:
+                self.update_display()
+                self.live.refresh()
+            except Exception as e:
+                # Keep the display alive; the error shows up on the next redraw
+                self.add_log(f"Display error: {e}", "ERROR")
+            # Changes made meanwhile just re-set the event and share the next redraw
+            time.sleep(self.refresh_interval)
+
+    def wait_for_input(self, prompt: str) -> str:
+        """Show a prompt in the input area and block until a line is entered"""
+        self.input_prompt = prompt
+        self.mark_dirty("input")
+        if self.selector.get_map():
+            self.selector.select()
+        line = sys.stdin.readline()
+        self.input_prompt = ""
+        self.mark_dirty("input")
+        return line.strip()
+
+    def set_status(self, status: str, package: Optional[str] = None):
+        """Set the status line and optionally the current package"""
+        self.installation_status = status
+        if package is not None:
+            self.current_package = package
+        self.mark_dirty("status")
+
+    def set_progress(self, current: int, total: Optional[int] = None):
+        """Set installation progress"""
+        self.progress_current = current
+        if total is not None:
+            self.progress_total = total
+        self.mark_dirty("status")
 
     def add_log(self, message: str, log_type: str = "INFO"):
         """Add a message to custom logs"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {log_type}: {message}"
-        self.custom_logs.append(log_entry)
+        now = int(time.time())
+        if now != self.log_time:
+            self.log_time = now
+            self.log_timestamp = time.strftime("%H:%M:%S", time.localtime(now))
+        log_entry = f"[{self.log_timestamp}] {log_type}: {message}"
+        with self.output_lock:
+            self.custom_logs.append(log_entry)
+        self.mark_dirty("logs")
 
     def add_pacman_output(self, line: str):
         """Add a line to pacman output"""
         if line.strip():  # Only add non-empty lines
-            self.pacman_output.append(line.rstrip())
-
-    def read_process_output(self, process: subprocess.Popen):
-        """Read process output in a separate thread"""
+            with self.output_lock:
+                self.pacman_output.append(line.rstrip())
+            self.mark_dirty("output")
+
+    def add_output_chunk(self, partial: bytes, data: bytes) -> bytes:
+        """Add the complete lines of a raw output chunk in one batch
+
+        Returns the trailing partial line.
+        """
+        # Decode everything up to the last line break in one go; \r counts
+        # as one so carriage-return progress meters become separate lines
+        data = partial + data
+        end = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1
+        text, partial = data[:end].decode("utf-8", "replace"), data[end:]
+        lines = [line.rstrip() for line in text.splitlines()]
+
+        batch = [line for line in lines if line.strip()]
+        with self.output_lock:
+            self.pacman_output.extend(batch)
+        self.mark_dirty("output")
+        if self.batch_pending:
+            self.track_batch_progress(lines)
+        return partial
+
+    def open_pidfd(self, process: subprocess.Popen) -> Optional[int]:
+        """Get a pollable fd that becomes readable when the process exits"""
+        # Needs Python 3.9+ and Linux 5.3+
+        if not hasattr(os, "pidfd_open"):
+            return None
+        try:
+            return os.pidfd_open(process.pid)
+        except OSError:
+            return None
+
+    def drain_output(self, fd: int, partial: bytes) -> Tuple[bytes, bool]:
+        """Read all available output, return leftover partial line and EOF flag"""
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                return partial, False
+            if not data:
+                return partial, True
+            partial = self.add_output_chunk(partial, data)
+
+    def stdin_watched(self) -> bool:
+        """Whether keyboard input is registered with the selector"""
+        return self.selector.get_map().get(sys.stdin) is not None
+
+    def watch_process(self, process: subprocess.Popen, pidfd: Optional[int]) -> int:
+        """Run the process to completion from a single selector loop
+
+        Wakes only when the process writes output or exits. Without a pidfd,
+        end of output counts as exit.
+        """
+        fd = process.stdout.fileno()
+        os.set_blocking(fd, False)
+        partial = b""
+
+        registered = [fd]
+        self.selector.register(fd, selectors.EVENT_READ, "output")
+        if pidfd is not None:
+            self.selector.register(pidfd, selectors.EVENT_READ, "exit")
+            registered.append(pidfd)
+
+        # The process reads the terminal itself, keystrokes are not ours
+        paused_stdin = self.stdin_watched()
+        if paused_stdin:
+            self.selector.unregister(sys.stdin)
         try:
             while True:
-                # Read from stdout
-                if process.stdout:
-                    line = process.stdout.readline()
-                    if line:
-                        self.add_pacman_output(line)
-                    elif process.poll() is not None:  # Process finished
-                        break
-                time.sleep(0.1)
-        except Exception as e:
-            self.add_log(f"Error reading output: {e}", "ERROR")
+                ready = {key.data for key, _ in self.selector.select()}
+                partial, eof = self.drain_output(fd, partial)
+                if "exit" in ready or (eof and pidfd is None):
+                    break
+                if eof and fd in registered:
+                    # Output closed but the process is still running
+                    self.selector.unregister(fd)
+                    registered.remove(fd)
+        finally:
+            for registered_fd in registered:
+                self.selector.unregister(registered_fd)
+            if paused_stdin:
+                self.selector.register(sys.stdin, selectors.EVENT_READ, "input")
 
-    def install_package(self, package: str, use_yay: bool = False) -> bool:
-        """Install a package using pacman or yay"""
-        self.current_package = package
-        self.installation_status = f"Installing {package}..."
-        self.add_log(f"Starting installation of {package}")
+        if partial:
+            self.add_pacman_output(partial.decode("utf-8", "replace"))
+        return process.wait()
 
+    def run_install(self, targets: List[str], use_yay: bool = False) -> int:
+        """Run one pacman/yay transaction for the targets, return its exit code"""
         # Choose command with --noconfirm and sudo for pacman
         if use_yay:
-            cmd = ["yay", "-S", "--noconfirm", package]
+            cmd = [self.yay_path, "-S", "--needed", "--noconfirm", *targets]
         else:
-            cmd = ["sudo", "pacman", "-S", "--noconfirm", package]
+            cmd = ["sudo", self.pacman_path, "-S", "--needed", "--noconfirm", *targets]
 
         try:
             # Start process with pipes for output capture but preserve stdin
@@ -161,73 +357,109 @@ class ArchInstaller:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 stdin=None,  # Inherit stdin for interactivity
-                text=True,
-                bufsize=1,  # Line buffered
+                bufsize=0,  # Raw bytes, read and decoded in chunks
             )
 
-            # Start thread to read output
-            output_thread = threading.Thread(
-                target=self.read_process_output,
-                args=(self.current_process,),
-                daemon=True,
-            )
-            output_thread.start()
+            pidfd = self.open_pidfd(self.current_process)
+            try:
+                return self.watch_process(self.current_process, pidfd)
+            finally:
+                if pidfd is not None:
+                    os.close(pidfd)
+        finally:
+            self.current_process = None
 
-            # Wait for process to complete
-            return_code = self.current_process.wait()
+    def install_package(self, package: str, use_yay: bool = False) -> bool:
+        """Install a package using pacman or yay"""
+        self.set_status(f"Installing {package}...", package)
+        self.add_log(f"Starting installation of {package}")
 
-            # Wait a bit for output thread to finish
-            time.sleep(0.5)
+        try:
+            return_code = self.run_install([package], use_yay)
+        except Exception as e:
+            self.add_log(f"✗ Exception installing {package}: {e}", "ERROR")
+            self.set_status(f"✗ {package} error")
+            return False
 
-            if return_code == 0:
-                self.add_log(f"✓ Successfully installed {package}", "SUCCESS")
-                self.installation_status = f"✓ {package} installed"
-                return True
-            else:
-                self.add_log(
-                    f"✗ Failed to install {package} (exit code: {return_code})", "ERROR"
-                )
-                self.installation_status = f"✗ {package} failed"
-                return False
+        if return_code == 0:
+            self.add_log(f"✓ Successfully installed {package}", "SUCCESS")
+            self.set_status(f"✓ {package} installed")
+            return True
+        else:
+            self.add_log(
+                f"✗ Failed to install {package} (exit code: {return_code})", "ERROR"
+            )
+            self.set_status(f"✗ {package} failed")
+            return False
 
+    def install_batch(self, packages: List[str], use_yay: bool = False) -> bool:
+        """Install all packages in a single pacman/yay transaction"""
+        self.set_status(f"Installing {len(packages)} packages...", "")
+        self.add_log(f"Starting batch installation of {len(packages)} packages")
+
+        # Progress is driven by the "installing <pkg>" lines in the output
+        self.batch_pending = set(packages)
+        try:
+            return_code = self.run_install(packages, use_yay)
         except Exception as e:
-            self.add_log(f"✗ Exception installing {package}: {e}", "ERROR")
-            self.installation_status = f"✗ {package} error"
+            self.add_log(f"✗ Exception in batch installation: {e}", "ERROR")
             return False
         finally:
-            self.current_process = None
+            self.batch_pending = set()
+
+        if return_code == 0:
+            self.add_log(
+                f"✓ Successfully installed {len(packages)} packages", "SUCCESS"
+            )
+            self.set_progress(len(packages))
+            return True
+        else:
+            self.add_log(
+                f"✗ Batch installation failed (exit code: {return_code})", "ERROR"
+            )
+            return False
+
+    def track_batch_progress(self, lines: List[str]):
+        """Advance batch progress from pacman's per-package transaction lines"""
+        for line in lines:
+            match = self.installing_re.match(line)
+            if match and match.group(1) in self.batch_pending:
+                package = match.group(1)
+                self.batch_pending.discard(package)
+                self.set_status(f"Installing {package}...", package)
+                self.set_progress(self.progress_total - len(self.batch_pending))
 
     def install_packages(self, packages: List[str], use_yay: bool = False):
-        """Install multiple packages"""
-        self.progress_total = len(packages)
-        self.progress_current = 0
+        """Install multiple packages, one by one only if the batch fails"""
+        self.set_progress(0, len(packages))
 
         successful = 0
         failed = 0
 
-        for i, package in enumerate(packages):
-            self.progress_current = i
-
-            # Update display before installation
-            self.update_display()
+        if len(packages) > 1 and self.install_batch(packages, use_yay):
+            successful = len(packages)
+        else:
+            if len(packages) > 1:
+                self.add_log(
+                    "Retrying packages one by one to isolate failures", "WARNING"
+                )
+                self.set_progress(0)
 
-            # Install package
-            success = self.install_package(package, use_yay)
+            for i, package in enumerate(packages):
+                self.set_progress(i)
 
-            if success:
-                successful += 1
-            else:
-                failed += 1
+                # Install package
+                success = self.install_package(package, use_yay)
 
-            self.progress_current = i + 1
-            self.update_display()
+                if success:
+                    successful += 1
+                else:
+                    failed += 1
 
-            # Small delay between packages
-            time.sleep(1)
+                self.set_progress(i + 1)
 
         # Final status
-        self.current_package = ""
-        self.installation_status = f"Complete: {successful} successful, {failed} failed"
+        self.set_status(f"Complete: {successful} successful, {failed} failed", "")
         self.add_log(
             f"Installation complete: {successful}/{len(packages)} packages installed"
         )
@@ -235,31 +467,43 @@ class ArchInstaller:
     def run_installer(self, packages: List[str], aur_packages: List[str] = None):
         """Main installer routine"""
         try:
-            with Live(self.layout, refresh_per_second=4, screen=True):
-                self.add_log("Arch Linux Auto-Installer started")
-                self.update_display()
-                time.sleep(2)
-
-                # Install regular packages
-                if packages:
-                    self.add_log(f"Installing {len(packages)} packages with pacman")
-                    self.install_packages(packages, use_yay=False)
-
-                # Install AUR packages
-                if aur_packages:
-                    self.add_log(
-                        f"Installing {len(aur_packages)} AUR packages with yay"
-                    )
-                    self.install_packages(aur_packages, use_yay=True)
-
-                # Final display
-                self.current_package = ""
-                self.installation_status = "All installations complete!"
-                self.add_log("Installer finished successfully")
-                self.update_display()
-
-                # Keep display open for review
-                input("\nPress Enter to exit...")
+            with Live(self.layout, auto_refresh=False, screen=True) as live:
+                self.start_refresh(live)
+                try:
+                    self.add_log("Arch Linux Auto-Installer started")
+
+                    # Install regular packages
+                    if packages and not self.pacman_path:
+                        self.add_log(
+                            f"pacman not found, skipping {len(packages)} packages",
+                            "WARNING",
+                        )
+                    elif packages:
+                        self.add_log(
+                            f"Installing {len(packages)} packages with pacman"
+                        )
+                        self.install_packages(packages, use_yay=False)
+
+                    # Install AUR packages
+                    if aur_packages and not self.yay_path:
+                        self.add_log(
+                            f"yay not found, skipping {len(aur_packages)} AUR packages",
+                            "WARNING",
+                        )
+                    elif aur_packages:
+                        self.add_log(
+                            f"Installing {len(aur_packages)} AUR packages with yay"
+                        )
+                        self.install_packages(aur_packages, use_yay=True)
+
+                    # Final display
+                    self.set_status("All installations complete!", "")
+                    self.add_log("Installer finished successfully")
+
+                    # Keep display open for review
+                    self.wait_for_input("Press Enter to exit")
+                finally:
+                    self.stop_refresh()
 
         except KeyboardInterrupt:
             self.add_log("Installation interrupted by user", "WARNING")